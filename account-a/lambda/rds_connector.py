@@ -1,111 +1,330 @@
 import os
-import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import boto3
+import orjson
 import psycopg2
+from psycopg2.extras import DictCursor
+from psycopg2.pool import SimpleConnectionPool
+from botocore.config import Config
+from botocore.credentials import RefreshableCredentials
 from botocore.exceptions import ClientError
+from botocore.session import get_session
+
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
+
+AWS_REGION = os.environ.get('AWS_REGION', 'us-east-1')
+ACCOUNT_B_ID = os.environ.get('ACCOUNT_B_ID')
+CROSS_ACCOUNT_ROLE_NAME = os.environ.get('CROSS_ACCOUNT_ROLE_NAME', 'CrossAccountRDSAccessRole')
+# External ID required by the Account B role trust policy
+EXTERNAL_ID = os.environ.get('EXTERNAL_ID')
+# RDS Proxy endpoint; when unset the RDS instance endpoint is used directly
+DB_PROXY_ENDPOINT = os.environ.get('DB_PROXY_ENDPOINT')
+# RDS instance endpoint; when set the DescribeDBInstances lookup is skipped
+RDS_ENDPOINT = os.environ.get('RDS_ENDPOINT')
+# Parameter Store path holding the database parameters
+SSM_PARAMETER_PATH = os.environ.get('SSM_PARAMETER_PATH', '/myapp/db/')
+# Run the version query on every invocation instead of only when requested
+HEALTHCHECK = os.environ.get('HEALTHCHECK', '0') == '1'
+# Seconds to keep Parameter Store values before fetching them again
+PARAM_TTL = int(os.environ.get('PARAM_TTL', 300))
+
+# AssumeRole arguments never change within a container
+_ROLE_ARN = f'arn:aws:iam::{ACCOUNT_B_ID}:role/{CROSS_ACCOUNT_ROLE_NAME}' if ACCOUNT_B_ID else None
+_ASSUME_KW = {
+    'RoleArn': _ROLE_ARN,
+    'RoleSessionName': 'LambdaRDSAccess',
+    'DurationSeconds': 3600
+}
+if EXTERNAL_ID:
+    _ASSUME_KW['ExternalId'] = EXTERNAL_ID
+
+# Log messages for AssumeRole failures with a known cause
+_STS_ERR_MAP = {
+    'AccessDenied': 'Access denied assuming the Account B role; check the trust policy, external ID and sts:AssumeRole permission',
+    'InvalidParameterValue': 'Invalid parameter value assuming the Account B role; check ACCOUNT_B_ID and CROSS_ACCOUNT_ROLE_NAME'
+}
+
+# Keep-alive connections, bounded timeouts and adaptive retries for STS throttling
+_BOTO_CONFIG = Config(
+    tcp_keepalive=True,
+    max_pool_connections=25,
+    retries={'max_attempts': 3, 'mode': 'adaptive'},
+    connect_timeout=2,
+    read_timeout=5
+)
+
+# Session and clients are created once per container and reused by warm invocations
+_BOTO_SESSION = boto3.session.Session(region_name=AWS_REGION)
+_SSM = _BOTO_SESSION.client('ssm', config=_BOTO_CONFIG)
+# Regional STS endpoint keeps AssumeRole in the Lambda's own region
+_STS = _BOTO_SESSION.client(
+    'sts',
+    endpoint_url=f'https://sts.{AWS_REGION}.amazonaws.com',
+    config=_BOTO_CONFIG
+)
+
+# Worker threads for overlapping independent AWS calls
+_EXECUTOR = ThreadPoolExecutor(max_workers=2)
+
+# Account B RDS client, created on first use; botocore re-assumes the
+# role whenever its credentials approach expiry
+_RDS = None
+
+# Parameter Store values and the monotonic time they expire at
+_PARAM_CACHE = {}
+_PARAM_EXPIRY = 0
+
+# RDS endpoints looked up via Account B, keyed by instance identifier
+_ENDPOINT_CACHE = {}
+_ENDPOINT_TTL = 3600
+
+# IAM database auth token; tokens are valid for 15 minutes, reuse for 13
+_TOKEN_CACHE = {'key': None, 'token': None, 'expiry': 0}
+_TOKEN_TTL = 13 * 60
+
+# Database connection pool, created lazily on the first invocation
+_POOL = None
 
 def lambda_handler(event, context):
-    # Initialize clients
-    ssm_client = boto3.client('ssm')
-    sts_client = boto3.client('sts')
-    
     try:
-        # Get parameters from Parameter Store
-        db_params = get_parameters_from_ssm(ssm_client)
+        # Get parameters from Parameter Store; when a database connection
+        # must be opened, assume the Account B role at the same time
+        if _POOL is None:
+            params_future = _EXECUTOR.submit(get_parameters_from_ssm, _SSM)
+            rds_future = _EXECUTOR.submit(get_rds_client)
+            db_params = params_future.result()
+            rds_future.result()
+        else:
+            db_params = get_parameters_from_ssm(_SSM)
         
-        # Assume role in Account B
-        assumed_role = assume_cross_account_role(sts_client)
-        
-        # Create RDS client with assumed role credentials
-        rds_client = create_rds_client(assumed_role)
-        
-        # Get RDS endpoint
-        db_endpoint = get_rds_endpoint(rds_client, db_params['db_instance_identifier'])
-        
-        # Connect to database
-        connection = connect_to_database(db_endpoint, db_params)
-        
-        # Execute query
-        result = execute_query(connection, "SELECT version();")
+        # Check the database, retrying once with a freshly resolved endpoint
+        # in case the cached endpoint or pooled connection went stale
+        healthcheck = HEALTHCHECK or bool(event.get('healthcheck'))
+        try:
+            result = check_database(db_params, healthcheck)
+        except psycopg2.OperationalError as e:
+            logger.warning("Database connection failed, reconnecting: %s", e)
+            reset_database_connection(db_params['db_instance_identifier'])
+            result = check_database(db_params, healthcheck)
         
         return {
             'statusCode': 200,
-            'body': json.dumps({
+            'body': orjson.dumps({
                 'message': 'Successfully connected to RDS',
                 'result': result
-            })
+            }, default=str).decode()
         }
         
     except Exception as e:
+        logger.error("Failed to query RDS: %s", e)
         return {
             'statusCode': 500,
-            'body': json.dumps({
+            'body': orjson.dumps({
                 'error': str(e)
-            })
+            }).decode()
         }
 
 def get_parameters_from_ssm(ssm_client):
-    """Retrieve database parameters from Parameter Store"""
-    parameters = {}
-    param_names = [
-        '/myapp/db/username',
-        '/myapp/db/password',
-        '/myapp/db/database',
-        '/myapp/db/instance_identifier'
-    ]
-    
-    response = ssm_client.get_parameters(
-        Names=param_names,
-        WithDecryption=True
+    """Retrieve database parameters from Parameter Store, cached for PARAM_TTL seconds"""
+    global _PARAM_EXPIRY
+    if time.monotonic() < _PARAM_EXPIRY:
+        return _PARAM_CACHE.copy()
+    
+    paginator = ssm_client.get_paginator('get_parameters_by_path')
+    pages = paginator.paginate(
+        Path=SSM_PARAMETER_PATH,
+        WithDecryption=True,
+        Recursive=False
     )
     
-    for param in response['Parameters']:
-        key = param['Name'].split('/')[-1]
-        parameters[f'db_{key}'] = param['Value']
+    parameters = {
+        f"db_{param['Name'].rsplit('/', 1)[1]}": param['Value']
+        for page in pages
+        for param in page['Parameters']
+    }
+    
+    _PARAM_CACHE.clear()
+    _PARAM_CACHE.update(parameters)
+    _PARAM_EXPIRY = time.monotonic() + PARAM_TTL
     
     return parameters
 
 def assume_cross_account_role(sts_client):
-    """Assume role in Account B"""
-    account_b_id = os.environ['ACCOUNT_B_ID']
-    role_name = 'CrossAccountRDSAccessRole'
+    """Assume role in Account B and return credentials as botocore refresh metadata"""
+    try:
+        response = sts_client.assume_role(**_ASSUME_KW)
+    except ClientError as e:
+        error_code = e.response['Error']['Code']
+        logger.error(_STS_ERR_MAP.get(error_code, f'Failed to assume role: {e}'))
+        raise
     
-    response = sts_client.assume_role(
-        RoleArn=f'arn:aws:iam::{account_b_id}:role/{role_name}',
-        RoleSessionName='LambdaRDSAccess'
-    )
+    credentials = response['Credentials']
     
-    return response['Credentials']
+    return {
+        'access_key': credentials['AccessKeyId'],
+        'secret_key': credentials['SecretAccessKey'],
+        'token': credentials['SessionToken'],
+        'expiry_time': credentials['Expiration'].isoformat()
+    }
 
-def create_rds_client(credentials):
-    """Create RDS client with assumed role credentials"""
-    return boto3.client(
+def create_rds_client(sts_client):
+    """Create RDS client with assumed role credentials that refresh automatically"""
+    refresh = partial(assume_cross_account_role, sts_client)
+    credentials = RefreshableCredentials.create_from_metadata(
+        metadata=refresh(),
+        refresh_using=refresh,
+        method='sts-assume-role'
+    )
+    
+    botocore_session = get_session()
+    botocore_session._credentials = credentials
+    
+    return boto3.Session(botocore_session=botocore_session).client(
         'rds',
-        aws_access_key_id=credentials['AccessKeyId'],
-        aws_secret_access_key=credentials['SecretAccessKey'],
-        aws_session_token=credentials['SessionToken']
+        region_name=AWS_REGION,
+        config=_BOTO_CONFIG
     )
 
+def get_rds_client():
+    """Return the Account B RDS client, creating it on first use"""
+    global _RDS
+    if _RDS is None:
+        _RDS = create_rds_client(_STS)
+    
+    return _RDS
+
+def resolve_db_endpoint(db_instance_identifier):
+    """Return the database host, looking up the RDS endpoint only when needed"""
+    if DB_PROXY_ENDPOINT or RDS_ENDPOINT:
+        return DB_PROXY_ENDPOINT or RDS_ENDPOINT
+    
+    cached = _ENDPOINT_CACHE.get(db_instance_identifier)
+    if cached and time.time() < cached[1]:
+        return cached[0]
+    
+    endpoint = get_rds_endpoint(get_rds_client(), db_instance_identifier)
+    logger.info("Retrieved RDS endpoint: %s", endpoint)
+    _ENDPOINT_CACHE[db_instance_identifier] = (endpoint, time.time() + _ENDPOINT_TTL)
+    
+    return endpoint
+
 def get_rds_endpoint(rds_client, db_instance_identifier):
     """Get RDS instance endpoint"""
-    response = rds_client.describe_db_instances(
-        DBInstanceIdentifier=db_instance_identifier
+    paginator = rds_client.get_paginator('describe_db_instances')
+    pages = paginator.paginate(
+        DBInstanceIdentifier=db_instance_identifier,
+        PaginationConfig={'PageSize': 20}
     )
     
-    return response['DBInstances'][0]['Endpoint']['Address']
+    for page in pages:
+        for instance in page['DBInstances']:
+            if instance['DBInstanceIdentifier'] == db_instance_identifier:
+                return instance['Endpoint']['Address']
+    
+    raise ValueError(f'RDS instance {db_instance_identifier} not found')
 
-def connect_to_database(endpoint, db_params):
-    """Connect to PostgreSQL database"""
-    return psycopg2.connect(
-        host=endpoint,
-        port=5432,
-        database=db_params['db_database'],
-        user=db_params['db_username'],
-        password=db_params['db_password']
+def get_db_auth_token(endpoint, username):
+    """Generate an IAM database auth token with the Account B role, cached until near expiry"""
+    key = (endpoint, username)
+    if _TOKEN_CACHE['key'] == key and time.time() < _TOKEN_CACHE['expiry']:
+        return _TOKEN_CACHE['token']
+    
+    token = get_rds_client().generate_db_auth_token(
+        DBHostname=endpoint,
+        Port=5432,
+        DBUsername=username,
+        Region=AWS_REGION
     )
+    
+    _TOKEN_CACHE.update(key=key, token=token, expiry=time.time() + _TOKEN_TTL)
+    
+    return token
+
+def connect_to_database(db_params):
+    """Return the PostgreSQL connection pool, creating it on first use"""
+    global _POOL
+    if _POOL is None:
+        endpoint = resolve_db_endpoint(db_params['db_instance_identifier'])
+        token = get_db_auth_token(endpoint, db_params['db_username'])
+        
+        logger.info("Connecting to database %s at %s", db_params['db_database'], endpoint)
+        # A single persistent connection per container; minconn=1 keeps it
+        # open when returned to the pool instead of closing it
+        _POOL = SimpleConnectionPool(
+            1, 1,
+            host=endpoint,
+            port=5432,
+            database=db_params['db_database'],
+            user=db_params['db_username'],
+            password=token,
+            sslmode='require'
+        )
+    
+    return _POOL
+
+def reset_database_connection(db_instance_identifier):
+    """Drop the pool and cached endpoint so the next call reconnects"""
+    global _POOL
+    if _POOL is not None:
+        _POOL.closeall()
+        _POOL = None
+    _ENDPOINT_CACHE.pop(db_instance_identifier, None)
+
+def check_database(db_params, healthcheck):
+    """Ensure the database connection is open; run the version query for health checks"""
+    if not healthcheck:
+        connect_to_database(db_params)
+        return None
+    
+    return query_database(db_params, "SELECT version();")
+
+def is_connection_usable(connection):
+    """Check a reused connection with a lightweight round-trip"""
+    if connection.closed:
+        return False
+    
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1;")
+        return True
+    except psycopg2.OperationalError:
+        return False
+
+def query_database(db_params, query):
+    """Execute a query on a connection borrowed from the pool"""
+    reused = _POOL is not None
+    pool = connect_to_database(db_params)
+    connection = pool.getconn()
+    if not connection.readonly:
+        connection.set_session(readonly=True)
+    
+    if reused and not is_connection_usable(connection):
+        logger.info("Pooled database connection is no longer usable, reconnecting")
+        reset_database_connection(db_params['db_instance_identifier'])
+        pool = connect_to_database(db_params)
+        connection = pool.getconn()
+        connection.set_session(readonly=True)
+    
+    try:
+        return execute_query(connection, query)
+    finally:
+        pool.putconn(connection)
 
 def execute_query(connection, query):
     """Execute a query and return results"""
+    logger.debug("Executing query: %s", query)
     with connection.cursor() as cursor:
         cursor.execute(query)
         return cursor.fetchall()
+
+def stream_query(connection, query, itersize=1000):
+    """Execute a query on a server-side cursor and yield rows in batches of itersize"""
+    logger.debug("Streaming query: %s", query)
+    with connection.cursor(name='stream_query', cursor_factory=DictCursor) as cursor:
+        cursor.itersize = itersize
+        cursor.execute(query)
+        yield from cursor